@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+from Sources import FOLDERS
+
+
+def write_frame(dir, folders, number, frames):
+    cv2.imwrite(os.path.join(dir, folders[0], number + ".png"), frames['RGB_left'])
+    cv2.imwrite(os.path.join(dir, folders[1], number + ".png"), frames['RGB_right'])
+    cv2.imwrite(os.path.join(dir, folders[3], number + ".png"), frames['RGB_left_unrectified'])
+    cv2.imwrite(os.path.join(dir, folders[4], number + ".png"), frames['RGB_right_unrectified'])
+    np.save(os.path.join(dir, folders[2], number + ".npy"), frames['depth'])
+    np.save(os.path.join(dir, folders[5], number + ".npy"), frames['disparity'])
+
+
+class CaptureMetrics:
+    def __init__(self):
+        self.captured = 0
+        self.written = 0
+        self.dropped_source = 0  # Missed by the grab loop (camera kept running)
+        self.dropped_queue = 0   # Grabbed but discarded because the writer queue was full
+        self.write_latencies = []
+        self.end_to_end_latencies = []
+        self.queue_depths = []
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record_write(self, write_latency, end_to_end_latency):
+        with self._lock:
+            self.written += 1
+            self.write_latencies.append(write_latency)
+            self.end_to_end_latencies.append(end_to_end_latency)
+
+    @staticmethod
+    def _stats(values):
+        if not values:
+            return {'mean': None, 'p95': None, 'max': None}
+        values = np.asarray(values) * 1000
+        return {'mean': float(np.mean(values)), 'p95': float(np.percentile(values, 95)), 'max': float(np.max(values))}
+
+    def summary(self):
+        return {
+            'captured': self.captured,
+            'written': self.written,
+            'dropped_source': self.dropped_source,
+            'dropped_queue': self.dropped_queue,
+            'elapsed_s': self.elapsed,
+            'fps_written': self.written / self.elapsed if self.elapsed else 0.0,
+            'write_latency_ms': self._stats(self.write_latencies),
+            'end_to_end_latency_ms': self._stats(self.end_to_end_latencies),
+            'queue_depth': {'mean': float(np.mean(self.queue_depths)) if self.queue_depths else 0.0,
+                            'max': int(max(self.queue_depths, default=0))},
+        }
+
+
+def _writer(frame_queue, dir, folders, metrics):
+    while True:
+        item = frame_queue.get()
+        if item is None:
+            frame_queue.task_done()
+            return
+        number, frames, grabbed_at = item
+        start = time.perf_counter()
+        write_frame(dir, folders, number, frames)
+        done = time.perf_counter()
+        metrics.record_write(done - start, done - grabbed_at)
+        frame_queue.task_done()
+
+
+def capture(source, dir, folders=FOLDERS, scene='scene_01', start_index=1, frames=None, queue_size=8, writers=1, block=False):
+    # Grab frames from source until it runs dry (or `frames` were grabbed) and write them in the background.
+    # With block=False a full queue drops the frame, like a real camera that does not wait for the disk.
+    # Open the source before the writer threads start, so a failed open leaves no thread waiting for its sentinel
+    if not source.open():
+        raise RuntimeError("Camera source could not be opened")
+    metrics = CaptureMetrics()
+    frame_queue = queue.Queue(maxsize=queue_size)
+    threads = [threading.Thread(target=_writer, args=(frame_queue, dir, folders, metrics), daemon=True)
+               for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    i = start_index
+    try:
+        while frames is None or metrics.captured < frames:
+            grabbed = source.grab()
+            if grabbed is None:
+                break
+            metrics.captured += 1
+            metrics.queue_depths.append(frame_queue.qsize())
+            item = (scene + '_' + f"{i:04}", grabbed, time.perf_counter())
+            i += 1
+            if block:
+                frame_queue.put(item)
+            else:
+                try:
+                    frame_queue.put_nowait(item)
+                except queue.Full:
+                    metrics.dropped_queue += 1
+    finally:
+        for _ in threads:
+            frame_queue.put(None)
+        for thread in threads:
+            thread.join()
+        metrics.elapsed = time.perf_counter() - start
+        metrics.dropped_source = source.dropped
+        source.close()
+    return metrics
@@ -1,37 +1,28 @@
-import pyzed.sl as sl
 import cv2
 import numpy as np
 import argparse
 import os.path
 import os
+import json
 
+from Sources import sl, FOLDERS, ZEDSource, ReplaySource, SyntheticSource
+from Capture import capture, write_frame
 
-def take_image_zed(zed, dir, folders, number, show_only=False):
-    imageL, imageR = sl.Mat(), sl.Mat()
-    imageLun, imageRun = sl.Mat(), sl.Mat()
-    depth_view = sl.Mat()
-    depth = sl.Mat()
-    disparity = sl.Mat()
-    runtime_parameters = sl.RuntimeParameters()
-    if zed.grab(runtime_parameters) == sl.ERROR_CODE.SUCCESS:
-        zed.retrieve_image(imageL, sl.VIEW.LEFT)  # Get the left image
-        zed.retrieve_image(imageR, sl.VIEW.RIGHT)
-        zed.retrieve_image(imageLun, sl.VIEW.LEFT_UNRECTIFIED)  # Get the left image
-        zed.retrieve_image(imageRun, sl.VIEW.RIGHT_UNRECTIFIED)  # Get the left image
-        zed.retrieve_image(depth_view, sl.VIEW.DEPTH)
-        zed.retrieve_measure(depth, sl.MEASURE.DEPTH)
-        zed.retrieve_measure(disparity, sl.MEASURE.DISPARITY)
-    d = depth.get_data()
-    dis = disparity.get_data()
-
-    imL, imR = imageL.get_data(), imageR.get_data()
-    imL_un, imR_un = imageLun.get_data(), imageRun.get_data()
+
+def take_image(source, dir, folders, number, show_only=False):
+    frames = source.grab()
+    if frames is None:
+        print('Camera source returned no frame')
+        return
+
+    imL, imR = frames['RGB_left'], frames['RGB_right']
+    depth_view = frames['depth_view']
     if show_only:
         h, w = int(imL.shape[0]*0.3), int(imL.shape[1]*0.3)
         cv2.imshow(f'ZED - RGB', np.hstack((cv2.resize(imL, (w, h)), cv2.resize(imR, (w, h)))))
         # cv2.imshow(f'ZED - right RGB {number}', imR)
-        h, w = int(depth_view.get_data().shape[0]*0.5), int(depth_view.get_data().shape[1]*0.5)
-        cv2.imshow(f'ZED - DEPTH_VIEW', cv2.resize(depth_view.get_data(), (w, h)))
+        h, w = int(depth_view.shape[0]*0.5), int(depth_view.shape[1]*0.5)
+        cv2.imshow(f'ZED - DEPTH_VIEW', cv2.resize(depth_view, (w, h)))
     else:
 
         ret, corners = cv2.findChessboardCorners(cv2.cvtColor(imL, cv2.COLOR_RGB2GRAY), (10, 9), cv2.CALIB_CB_ADAPTIVE_THRESH)
@@ -43,12 +34,7 @@ def take_image_zed(zed, dir, folders, number, show_only=False):
         print(np.nanmean(k))
         '''
         print('ZED Chessboard:', ret)
-        cv2.imwrite(os.path.join(dir, folders[0], number + ".png"), imL)
-        cv2.imwrite(os.path.join(dir, folders[1], number + ".png"), imR)
-        cv2.imwrite(os.path.join(dir, folders[3], number + ".png"), imL_un)
-        cv2.imwrite(os.path.join(dir, folders[4], number + ".png"), imR_un)
-        np.save(os.path.join(dir, folders[2], number + ".npy"), d)
-        np.save(os.path.join(dir, folders[5], number + ".npy"), dis)
+        write_frame(dir, folders, number, frames)
 
 def zed_init(calibration_file=None):
     # Create a InitParameters object and set configuration parameters
@@ -73,43 +59,66 @@ if __name__ == '__main__':
     # Args handling -> check help parameters to understand
     parser = argparse.ArgumentParser(description='Camera')
     parser.add_argument('--path', type=str, default='data/240718_test', help='path for saved images')
-    parser.add_argument('--mode', type=str, default='recording', help='calibration or recording')
+    parser.add_argument('--mode', type=str, default='recording', help='calibration, recording or benchmark')
     parser.add_argument('--scene', type=str, default='scene_01', help='name of the scene')
+    parser.add_argument('--source', type=str, default='zed', help='zed, replay or synthetic')
+    parser.add_argument('--replay', type=str, default='Project/Examples_ZED', help='recorded branch played back by the replay source')
+    parser.add_argument('--fps', type=int, default=15, help='frame rate of the replay/synthetic source')
+    parser.add_argument('--frames', type=int, default=None, help='number of frames to grab in benchmark mode')
+    parser.add_argument('--queue', type=int, default=8, help='writer queue size in benchmark mode')
     calib = True
     filter_default = True
     image_index_to_start = 1  # delfault = 1 == calib not zero
 
     args = parser.parse_args()
     dir = os.path.abspath(args.path)
+    if args.mode == 'benchmark' and args.frames is None:
+        parser.error('--frames is required in benchmark mode')
 
     ''' ZED '''
-    # Create a Camera object
-    zed = sl.Camera()
-    zed.set_camera_settings(sl.VIDEO_SETTINGS.EXPOSURE, 50)
-
     stereoParam = {}
-    #init_params = zed_init('zed_calibration.yml')
-    init_params_default = zed_init()
-
-    err = zed.open(init_params_default)#init_params)
-
-    if err != sl.ERROR_CODE.SUCCESS:
-        print('ZED nicht verbunden oder file not !')
-        exit(1)
-    calibration_params = zed.get_camera_information().camera_configuration.calibration_parameters
-    # Focal length of the left eye in pixels
-    intrinsics_zed = np.identity(3)
-    distortion_zed = calibration_params.left_cam.disto
-    intrinsics_zed[0, 0] = calibration_params.left_cam.fx
-    intrinsics_zed[1, 1] = calibration_params.left_cam.fy
-    intrinsics_zed[0, 2] = calibration_params.left_cam.cx
-    intrinsics_zed[1, 2] = calibration_params.left_cam.cy
-    # First radial distortion coefficient
-    # print(intrinsics_zed)
-    stereoParam['intrinsics_zedL'] = intrinsics_zed.tolist()
-    stereoParam['distortion_zedL'] = distortion_zed.tolist()
-    zed.close()
+    if args.source == 'zed':
+        if sl is None:
+            print('pyzed is not installed, use --source replay or --source synthetic')
+            exit(1)
+        #init_params = zed_init('zed_calibration.yml')
+        init_params_default = zed_init()
+        source = ZEDSource(init_params_default, fps=args.fps)
+        # Create a Camera object
+        zed = source.zed
+        zed.set_camera_settings(sl.VIDEO_SETTINGS.EXPOSURE, 50)
+
+        if not source.open():
+            print('ZED nicht verbunden oder file not !')
+            exit(1)
+        calibration_params = zed.get_camera_information().camera_configuration.calibration_parameters
+        # Focal length of the left eye in pixels
+        intrinsics_zed = np.identity(3)
+        distortion_zed = calibration_params.left_cam.disto
+        intrinsics_zed[0, 0] = calibration_params.left_cam.fx
+        intrinsics_zed[1, 1] = calibration_params.left_cam.fy
+        intrinsics_zed[0, 2] = calibration_params.left_cam.cx
+        intrinsics_zed[1, 2] = calibration_params.left_cam.cy
+        # First radial distortion coefficient
+        # print(intrinsics_zed)
+        stereoParam['intrinsics_zedL'] = intrinsics_zed.tolist()
+        stereoParam['distortion_zedL'] = distortion_zed.tolist()
+        source.close()
+    elif args.source == 'replay':
+        source = ReplaySource(args.replay, fps=args.fps, loop=args.frames is not None)
+    elif args.source == 'synthetic':
+        source = SyntheticSource(fps=args.fps, count=args.frames)
+    else:
+        raise ValueError("Unsupported camera source")
 
+    if args.mode == 'benchmark':
+        # Unattended capture into dir/ZED without preview or prompts, e.g. on a CI box without camera
+        for subfolder in FOLDERS:
+            os.makedirs(os.path.join(dir, 'ZED', subfolder), exist_ok=True)
+        metrics = capture(source, os.path.join(dir, 'ZED'), scene=args.scene, start_index=image_index_to_start,
+                          frames=args.frames, queue_size=args.queue)
+        print(json.dumps(metrics.summary(), indent=4))
+        exit(0)
 
     if not os.path.exists(dir):
         os.mkdir(dir)
@@ -136,15 +145,15 @@ if __name__ == '__main__':
     i = image_index_to_start
 
     while 'recording':
-        err = zed.open(init_params_default)
+        source.open()
         index = args.scene + '_' + f"{i:04}"
         while True:
-            take_image_zed(zed, dir, directory['ZED'], number=index, show_only=True)
+            take_image(source, dir, directory['ZED'], number=index, show_only=True)
             k = cv2.waitKey(10)
             if k == 32:  # LEERTASTE
                 break
             elif k == 13:  # ENTER
                 print('ENDE')
                 exit(0)
-        take_image_zed(zed, os.path.join(dir, 'ZED'), directory['ZED'], number=index)
+        take_image(source, os.path.join(dir, 'ZED'), directory['ZED'], number=index)
         i+=1
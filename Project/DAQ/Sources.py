@@ -0,0 +1,160 @@
+import os
+import time
+import cv2
+import numpy as np
+
+try:
+    import pyzed.sl as sl
+except ImportError:  # No ZED SDK installed, only the replay/synthetic sources are available
+    sl = None
+
+# Sub folders written per camera branch, in the order DAQ.py creates them
+FOLDERS = ['RGB_left', 'RGB_right', 'depth', 'RGB_left_unrectified', 'RGB_right_unrectified', 'disparity']
+
+
+class CameraSource:
+    # Common interface: open() -> bool, grab() -> dict of frames (FOLDERS + 'depth_view') or None, close()
+    fps = 15
+
+    def __init__(self, fps=15):
+        self.fps = fps
+        self.dropped = 0  # Frames the "sensor" produced while nobody was grabbing
+        self._start = None
+        self._last_tick = -1
+
+    def open(self):
+        self._start = time.perf_counter()
+        self._last_tick = -1
+        return True
+
+    def close(self):
+        pass
+
+    def _wait_for_frame(self):
+        # Emulate a free running camera: block until the next frame is due, count frames that were missed
+        if self._start is None:
+            self.open()
+        tick = int((time.perf_counter() - self._start) * self.fps)
+        if tick <= self._last_tick:
+            tick = self._last_tick + 1
+            time.sleep(max(0.0, self._start + tick / self.fps - time.perf_counter()))
+        self.dropped += max(0, tick - self._last_tick - 1)
+        self._last_tick = tick
+        return tick
+
+    def grab(self):
+        raise NotImplementedError
+
+
+class ZEDSource(CameraSource):
+    def __init__(self, init_params, fps=15):
+        super().__init__(fps)
+        if sl is None:
+            raise RuntimeError("pyzed is not installed, use the replay or synthetic source instead")
+        self.zed = sl.Camera()
+        self.init_params = init_params
+
+    def open(self):
+        return self.zed.open(self.init_params) == sl.ERROR_CODE.SUCCESS
+
+    def close(self):
+        self.zed.close()
+
+    def grab(self):
+        mats = {name: sl.Mat() for name in FOLDERS + ['depth_view']}
+        runtime_parameters = sl.RuntimeParameters()
+        if self.zed.grab(runtime_parameters) != sl.ERROR_CODE.SUCCESS:
+            return None
+        self.zed.retrieve_image(mats['RGB_left'], sl.VIEW.LEFT)
+        self.zed.retrieve_image(mats['RGB_right'], sl.VIEW.RIGHT)
+        self.zed.retrieve_image(mats['RGB_left_unrectified'], sl.VIEW.LEFT_UNRECTIFIED)
+        self.zed.retrieve_image(mats['RGB_right_unrectified'], sl.VIEW.RIGHT_UNRECTIFIED)
+        self.zed.retrieve_image(mats['depth_view'], sl.VIEW.DEPTH)
+        self.zed.retrieve_measure(mats['depth'], sl.MEASURE.DEPTH)
+        self.zed.retrieve_measure(mats['disparity'], sl.MEASURE.DISPARITY)
+        self.dropped = self.zed.get_frame_dropped_count()
+        return {name: mat.get_data() for name, mat in mats.items()}
+
+
+def depth_to_view(depth):
+    # 8-bit preview of a metric depth map, similar to sl.VIEW.DEPTH
+    valid = np.isfinite(depth)
+    view = np.zeros(depth.shape, dtype=np.uint8)
+    if valid.any():
+        near, far = np.min(depth[valid]), np.max(depth[valid])
+        view[valid] = 255 - (depth[valid] - near) / max(far - near, 1e-6) * 255
+    return cv2.cvtColor(view, cv2.COLOR_GRAY2BGRA)
+
+
+class ReplaySource(CameraSource):
+    # Plays back a recorded branch (e.g. 'data/240718_test/ZED' or 'Project/Examples_ZED')
+    def __init__(self, path, fps=15, loop=False):
+        super().__init__(fps)
+        self.path = os.path.normpath(path)
+        left_dir = os.path.join(self.path, 'RGB_left')
+        self.names = sorted(os.path.splitext(f)[0] for f in os.listdir(left_dir) if f.endswith('.png'))
+        if not self.names:
+            raise FileNotFoundError(f"No RGB_left PNGs found in {left_dir}")
+        self.loop = loop
+        self.position = 0
+
+    def _load(self, folder, name, extension):
+        file_path = os.path.join(self.path, folder, name + extension)
+        if not os.path.exists(file_path):
+            return None
+        return np.load(file_path) if extension == '.npy' else cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+
+    def grab(self):
+        if self.position >= len(self.names):
+            if not self.loop:
+                return None
+            self.position = 0
+        name = self.names[self.position]
+        self.position += 1
+        frames = {'RGB_left': self._load('RGB_left', name, '.png')}
+        for folder in ['RGB_right', 'RGB_left_unrectified', 'RGB_right_unrectified']:
+            image = self._load(folder, name, '.png')
+            frames[folder] = frames['RGB_left'] if image is None else image
+        depth = self._load('depth', name, '.npy')
+        if depth is None:
+            depth = np.full(frames['RGB_left'].shape[:2], np.nan, dtype=np.float32)
+        disparity = self._load('disparity', name, '.npy')
+        frames['depth'] = depth
+        frames['disparity'] = np.zeros_like(depth) if disparity is None else disparity
+        frames['depth_view'] = depth_to_view(depth)
+        self._wait_for_frame()
+        return frames
+
+
+class SyntheticSource(CameraSource):
+    # Generated frames: a few red/green "apples" drifting over a foliage coloured background
+    def __init__(self, width=1920, height=1080, fps=15, count=None, apples=6, seed=0):
+        super().__init__(fps)
+        self.width, self.height = width, height
+        self.count = count
+        self.position = 0
+        rng = np.random.default_rng(seed)
+        self.centers = rng.uniform((0, 0), (width, height), size=(apples, 2))
+        self.velocity = rng.uniform(-8, 8, size=(apples, 2))
+        self.radii = rng.uniform(0.03, 0.08, size=apples) * height
+        self.distances = rng.uniform(800, 2500, size=apples)  # mm
+        self.colors = [(40, 40, 200) if red else (40, 180, 60) for red in rng.random(apples) < 0.6]
+        self.background = np.zeros((height, width, 4), dtype=np.uint8)
+        self.background[:] = (30, 90, 40, 255)
+
+    def grab(self):
+        if self.count is not None and self.position >= self.count:
+            return None
+        self.position += 1
+        image = self.background.copy()
+        depth = np.full((self.height, self.width), 4000, dtype=np.float32)
+        self.centers = (self.centers + self.velocity) % (self.width, self.height)
+        for (x, y), radius, distance, color in zip(self.centers, self.radii, self.distances, self.colors):
+            center = (int(x), int(y))
+            cv2.circle(image, center, int(radius), color + (255,), -1)
+            cv2.circle(depth, center, int(radius), float(distance), -1)
+        frames = {'RGB_left': image, 'RGB_right': image, 'RGB_left_unrectified': image,
+                  'RGB_right_unrectified': image, 'depth': depth,
+                  'disparity': np.zeros_like(depth), 'depth_view': depth_to_view(depth)}
+        self._wait_for_frame()
+        return frames
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+import cv2
+import numpy as np
+import Features
+import Manifest
+import Interpretation
+
+# Largest allowed log-log slope of time or memory over detection count before the run counts as superlinear
+MAX_GROWTH_EXPONENT = 1.3
+
+
+def scene_name(image_num):
+    # Inverse of the Manifest image id numbering
+    scene_number, frame = divmod(image_num, Manifest.FRAMES_PER_SCENE)
+    return f"scene_{scene_number + 1:02d}_{frame:04d}"
+
+
+def generate_session(input_path, image_directory, detections, detections_per_image=10, image_size=32, seed=0):
+    # Synthetic stage outputs as Segmentation, Retreive_Depth and Examination would leave them
+    rng = np.random.default_rng(seed)
+    images = max(1, detections // detections_per_image)
+    os.makedirs(input_path, exist_ok=True)
+    os.makedirs(image_directory, exist_ok=True)
+
+    keys = [f"Image_{i // detections_per_image + 1}_Mask_{i % detections_per_image}" for i in range(detections)]
+    coordinates = rng.integers(0, image_size, size=(detections, 2))
+    means = rng.uniform(0, 255, size=(detections, 3))
+    percentages = rng.uniform(0, 5, size=detections)
+    depths = rng.uniform(500, 3000, size=detections)
+
+    centroids = {key: {"centroid_x": int(x), "centroid_y": int(y)} for key, (x, y) in zip(keys, coordinates)}
+    histograms = {key: {"B": float(b), "G": float(g), "R": float(r)} for key, (b, g, r) in zip(keys, means)}
+    non_black = {key: float(percentage) for key, percentage in zip(keys, percentages)}
+    depth_info = {key: {"centroid_x": int(x), "centroid_y": int(y), "depth": float(depth)}
+                  for key, (x, y), depth in zip(keys, coordinates, depths)}
+    for filename, data in [('centroids.json', centroids), ('color_histograms.json', histograms),
+                           ('non_black_percentage.json', non_black), ('depths.json', depth_info)]:
+        with open(os.path.join(input_path, filename), 'w') as f:
+            json.dump(data, f)
+
+    features = rng.uniform(0, 1, size=(detections, Features.FEATURE_SIZE))
+    Features.save_features(input_path, keys, features)
+
+    # Stub images: every image number gets its combined/result image and a scene image
+    ok, stub = cv2.imencode('.jpg', np.zeros((image_size, image_size, 3), dtype=np.uint8))
+    ok, scene_stub = cv2.imencode('.png', np.zeros((image_size, image_size, 3), dtype=np.uint8))
+    for image_num in range(1, images + 1):
+        for filename in [f"Combined_Masked_Pixels_{image_num}.jpg", f"Result_{image_num}.jpg"]:
+            with open(os.path.join(input_path, filename), 'wb') as f:
+                f.write(stub.tobytes())
+        with open(os.path.join(image_directory, scene_name(image_num) + '.png'), 'wb') as f:
+            f.write(scene_stub.tobytes())
+
+
+def measure(function, *args, **kwargs):
+    # Wall time and peak traced allocation (numpy buffers included) of one call, stage prints muted
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_size(work_directory, detections):
+    input_path = os.path.join(work_directory, f'run_{detections}')
+    image_directory = os.path.join(input_path, 'RGB_left')
+    generate_session(input_path, image_directory, detections)
+    manifest = Manifest.build_manifest(image_directory=image_directory)
+
+    data, dataset_time, dataset_peak = measure(Interpretation.generate_dataset_from_json, input_path)
+    _, draw_time, draw_peak = measure(Interpretation.draw_arbitrary_value, data, input_path, input_path)
+    _, final_time, final_peak = measure(Interpretation.generate_final_result, input_path, image_directory, data, manifest=manifest)
+    shutil.rmtree(input_path)
+
+    return {
+        'generate_dataset_from_json': {'time_s': dataset_time, 'peak_bytes': dataset_peak},
+        'draw_arbitrary_value': {'time_s': draw_time, 'peak_bytes': draw_peak},
+        'generate_final_result': {'time_s': final_time, 'peak_bytes': final_peak},
+    }
+
+
+def growth_exponents(counts, values):
+    # Least squares slope in log-log space: 1 means linear, 2 quadratic
+    return float(np.polyfit(np.log(counts), np.log(np.maximum(values, 1e-9)), 1)[0])
+
+
+def main(min_exponent=2, max_exponent=4, work_directory=None, results_path=None, max_growth=MAX_GROWTH_EXPONENT):
+    print("\n")
+    print("=================================")
+    print("== Interpretation Benchmark Start ")
+    print("=================================")
+
+    counts = [10 ** exponent for exponent in range(min_exponent, max_exponent + 1)]
+    own_directory = work_directory is None
+    if own_directory:
+        work_directory = tempfile.mkdtemp(prefix='interpretation_benchmark_')
+
+    results = {}
+    try:
+        for detections in counts:
+            results[detections] = run_size(work_directory, detections)
+            for function, values in results[detections].items():
+                print(f"{detections:>8} detections  {function:<28} {values['time_s']:9.3f}s  {values['peak_bytes'] / 2**20:9.1f} MiB")
+    finally:
+        if own_directory:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    # Small sizes are dominated by fixed costs, so fit the growth on the upper sizes only
+    fitted = [count for count in counts if count >= counts[-1] / 100] if len(counts) > 2 else counts
+    failures = []
+    growth = {}
+    if len(fitted) >= 2:
+        for function in results[counts[0]]:
+            for metric in ['time_s', 'peak_bytes']:
+                exponent = growth_exponents(fitted, [results[count][function][metric] for count in fitted])
+                growth[f"{function}.{metric}"] = exponent
+                print(f"Growth of {function} {metric}: n^{exponent:.2f}")
+                if exponent > max_growth:
+                    failures.append(f"{function} {metric} grows as n^{exponent:.2f}")
+
+    if results_path is not None:
+        with open(results_path, 'w') as f:
+            json.dump({'results': results, 'growth': growth, 'failures': failures}, f, indent=4)
+
+    print("\n")
+    print("=================================")
+    print("=== Interpretation Benchmark End ")
+    print("=================================")
+
+    if failures:
+        print("Superlinear growth detected:")
+        for failure in failures:
+            print(f"  {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the Interpretation stage')
+    parser.add_argument('--min-exponent', type=int, default=2, help='smallest run has 10^min detections')
+    parser.add_argument('--max-exponent', type=int, default=4, help='largest run has 10^max detections (up to 6)')
+    parser.add_argument('--work', type=str, default=None, help='directory for the synthetic sessions (default: temp dir)')
+    parser.add_argument('--results', type=str, default=None, help='write the measurements to this JSON file')
+    parser.add_argument('--max-growth', type=float, default=MAX_GROWTH_EXPONENT, help='allowed log-log growth exponent')
+    args = parser.parse_args()
+    sys.exit(0 if main(args.min_exponent, args.max_exponent, args.work, args.results, args.max_growth) else 1)
@@ -3,20 +3,34 @@ import re
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
-import json
+import Features
+import Manifest
+import Masks
+import Output
 
 def image_selector(input_path):
-    pattern = re.compile(r'^Image_(\d+)_Mask_(\d+)\.jpg$')
-    matching_files = []
+    # Image numbers with a Masks_<n>.jsonl written by Segmentation
+    pattern = re.compile(r'^Masks_(\d+)\.jsonl$')
+    image_numbers = []
     for filename in os.listdir(input_path):
         match = pattern.match(filename)
         if match:
-            image_number = int(match.group(1))
-            matching_files.append((image_number, os.path.join(input_path, filename)))
-    return matching_files
+            image_numbers.append(int(match.group(1)))
+    return image_numbers
 
-def generate_color_histogram(image_path, ignore_black=True, visualize=True):
-    image = cv2.imread(image_path)
+def load_frame(input_path, image_number, manifest=None):
+    # The original frame when the manifest knows it, else Segmentation's combined image (overlaps there are summed)
+    image_path = Manifest.lookup(manifest, image_number) if manifest is not None else None
+    if image_path is None:
+        image_path = os.path.join(input_path, f"Combined_Masked_Pixels_{image_number}.jpg")
+    frame = cv2.imread(image_path)
+    if frame is None:
+        raise FileNotFoundError(f"Frame {image_path} not found.")
+    return frame
+
+def generate_color_histogram(image_path, ignore_black=True, visualize=True, image=None):
+    if image is None:
+        image = cv2.imread(image_path)
     image_path = os.path.basename(image_path)
     channels = cv2.split(image)
     colors = ('b', 'g', 'r')
@@ -48,10 +62,12 @@ def generate_color_histogram(image_path, ignore_black=True, visualize=True):
     
     return mean_values
 
-def calculate_non_black_percentage(image_path):
-    image = cv2.imread(image_path)
+def calculate_non_black_percentage(image_path, image=None, total_pixels=None):
+    if image is None:
+        image = cv2.imread(image_path)
     gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    total_pixels = gray_image.size
+    if total_pixels is None:
+        total_pixels = gray_image.size
     non_black_pixels = np.count_nonzero(gray_image)
     non_black_percentage = (non_black_pixels / total_pixels) * 100
       
@@ -59,32 +75,56 @@ def calculate_non_black_percentage(image_path):
     
     return non_black_percentage
 
-def main(input_path='Project/Results/Test', results_path='Project/Results/Test', visualize=True):
+def main(input_path='Project/Results/Test', results_path='Project/Results/Test', visualize=True, manifest=None, writer=None):
     print("\n") 
     print("=================================") 
     print("==== Color Examination Start ====")
     print("=================================") 
     
-    selected_images = image_selector(input_path)
-    selected_images.sort()  # Sort by image number
+    writer, own_writer = Output.open_writer(writer)
+    if manifest is None and os.path.exists(os.path.join(input_path, Manifest.MANIFEST_FILE)):
+        manifest = Manifest.load_manifest(input_path)
+    selected_images = sorted(image_selector(input_path))  # Sort by image number
+    frame_records = [(image_number, Masks.load_frame_masks(input_path, image_number)) for image_number in selected_images]
     results_color = {}
     results_size = {}
+    feature_keys = [record['key'] for _, records in frame_records for record in records]
+    depths = Features.load_depths(input_path, feature_keys)
+    feature_chunks = []
+    pixel_sets = []
+    index = 0
+    
+    for image_number, records in frame_records:
+        # Decode each frame once and cut every mask out of it, cropped to its bounding box
+        frame = load_frame(input_path, image_number, manifest)
+        for record in records:
+            image_name = record['key']
+            crop = Masks.masked_crop(frame, record)
+            frame_size = record['size'][0] * record['size'][1]
+            mean_values = generate_color_histogram(image_name, visualize=visualize, image=crop)
+            non_black_percentage = calculate_non_black_percentage(image_name, image=crop, total_pixels=frame_size)
+            results_color[image_name] = mean_values
+            results_size[image_name] = non_black_percentage
+            pixel_sets.append(Features.mask_pixels(crop, frame_size))
+            index += 1
+            
+            # Compute the feature vectors chunk by chunk, each chunk in one batch
+            if len(pixel_sets) == Features.CHUNK_MASKS or index == len(feature_keys):
+                start = index - len(pixel_sets)
+                feature_chunks.append(Features.extract_features(pixel_sets, depths[start:index]))
+                pixel_sets = []
     
-    for image_number, image_path in selected_images:
-        image_name = os.path.splitext(os.path.basename(image_path))[0]
-        mean_values = generate_color_histogram(image_path, visualize=visualize)
-        non_black_percentage = calculate_non_black_percentage(image_path)
-        results_color[image_name] = mean_values
-        results_size[image_name] = non_black_percentage
+    if feature_chunks:
+        Features.save_features(results_path, feature_keys, np.concatenate(feature_chunks), writer=writer)
         
     # Write the results dictionary to a JSON file
     if results_color:
-        with open(os.path.join(results_path, 'color_histograms.json'), 'w') as json_file:
-            json.dump(results_color, json_file, indent=4)
+        writer.write_json(os.path.join(results_path, 'color_histograms.json'), results_color, indent=4)
     
     if results_size:
-        with open(os.path.join(results_path, 'non_black_percentage.json'), 'w') as json_file:
-            json.dump(results_size, json_file, indent=4)
+        writer.write_json(os.path.join(results_path, 'non_black_percentage.json'), results_size, indent=4)
+
+    Output.finish_writer(writer, own_writer)
                 
     print("\n") 
     print("=================================") 
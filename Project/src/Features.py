@@ -0,0 +1,194 @@
+import os
+import json
+import cv2
+import numpy as np
+import Output
+
+# Histogram resolution per channel (OpenCV 8-bit ranges: H in [0, 180), others in [0, 256))
+HUE_BINS = 18
+SAT_BINS = 8
+VAL_BINS = 8
+LAB_BINS = 8
+
+# Hue bands (OpenCV scale) used for the red/green ratio; pixels below MIN_SATURATION carry no hue
+RED_HUE_LOW = 10
+RED_HUE_HIGH = 160
+GREEN_HUE = (35, 85)
+MIN_SATURATION = 40
+
+SCALAR_FEATURES = ['mean_b', 'mean_g', 'mean_r', 'mean_l', 'mean_a', 'mean_lab_b',
+                   'red_ratio', 'green_ratio', 'red_green_ratio',
+                   'pixel_count', 'non_black_percentage', 'depth', 'size_normalized']
+
+# Layout of a feature vector: name -> slice
+FEATURE_LAYOUT = {}
+_offset = 0
+for _name, _size in [('hist_h', HUE_BINS), ('hist_s', SAT_BINS), ('hist_v', VAL_BINS),
+                     ('hist_l', LAB_BINS), ('hist_a', LAB_BINS), ('hist_lab_b', LAB_BINS)]:
+    FEATURE_LAYOUT[_name] = slice(_offset, _offset + _size)
+    _offset += _size
+for _name in SCALAR_FEATURES:
+    FEATURE_LAYOUT[_name] = _offset
+    _offset += 1
+FEATURE_SIZE = _offset
+
+FEATURES_FILE = 'features.npz'
+
+
+# Masks per vectorized call; bounds the per pixel working arrays to one chunk instead of the whole session
+CHUNK_MASKS = 256
+
+
+def mask_pixels(image, frame_size=None):
+    # Keep only the pixels inside the mask (everything else is black); frame_size defaults to the image size
+    inside = image.any(axis=2)
+    if frame_size is None:
+        frame_size = image.shape[0] * image.shape[1]
+    return image[inside], frame_size
+
+
+def _segment_histogram(segments, values, bins, value_range, count):
+    bin_index = np.minimum(values.astype(np.int32) * bins // value_range, bins - 1)
+    hist = np.bincount(segments * bins + bin_index, minlength=count * bins).reshape(count, bins)
+    return hist.astype(np.float64)
+
+
+def _segment_mean(segments, values, count, sizes):
+    sums = np.bincount(segments, weights=values, minlength=count)
+    return sums / np.maximum(sizes, 1)
+
+
+def _segment_nonzero_mean(segments, values, count):
+    # Mean over the non zero values only, as Examination.generate_color_histogram does (NaN if there are none)
+    sums = np.bincount(segments, weights=values, minlength=count)
+    nonzero = np.bincount(segments, weights=values > 0, minlength=count)
+    means = np.full(count, np.nan)
+    np.divide(sums, nonzero, out=means, where=nonzero > 0)
+    return means
+
+
+def _extract_chunk(pixel_sets, depths):
+    count = len(pixel_sets)
+    features = np.zeros((count, FEATURE_SIZE), dtype=np.float64)
+    sizes = np.array([len(pixels) for pixels, _ in pixel_sets], dtype=np.int64)
+    frame_sizes = np.array([frame_size for _, frame_size in pixel_sets], dtype=np.float64)
+    segments = np.repeat(np.arange(count, dtype=np.int32), sizes)
+    bgr = np.concatenate([pixels.reshape(-1, 3) for pixels, _ in pixel_sets]).astype(np.uint8)
+
+    if len(bgr):
+        # One colour conversion over every pixel of the chunk
+        hsv = cv2.cvtColor(bgr.reshape(-1, 1, 3), cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        lab = cv2.cvtColor(bgr.reshape(-1, 1, 3), cv2.COLOR_BGR2LAB).reshape(-1, 3)
+        gray = cv2.cvtColor(bgr.reshape(-1, 1, 3), cv2.COLOR_BGR2GRAY).reshape(-1)
+    else:
+        hsv = lab = bgr
+        gray = bgr[:, 0]
+
+    norm = np.maximum(sizes, 1)[:, None]
+    features[:, FEATURE_LAYOUT['hist_h']] = _segment_histogram(segments, hsv[:, 0], HUE_BINS, 180, count) / norm
+    features[:, FEATURE_LAYOUT['hist_s']] = _segment_histogram(segments, hsv[:, 1], SAT_BINS, 256, count) / norm
+    features[:, FEATURE_LAYOUT['hist_v']] = _segment_histogram(segments, hsv[:, 2], VAL_BINS, 256, count) / norm
+    features[:, FEATURE_LAYOUT['hist_l']] = _segment_histogram(segments, lab[:, 0], LAB_BINS, 256, count) / norm
+    features[:, FEATURE_LAYOUT['hist_a']] = _segment_histogram(segments, lab[:, 1], LAB_BINS, 256, count) / norm
+    features[:, FEATURE_LAYOUT['hist_lab_b']] = _segment_histogram(segments, lab[:, 2], LAB_BINS, 256, count) / norm
+
+    for column, name in enumerate(['mean_b', 'mean_g', 'mean_r']):
+        features[:, FEATURE_LAYOUT[name]] = _segment_nonzero_mean(segments, bgr[:, column], count)
+    for column, name in enumerate(['mean_l', 'mean_a', 'mean_lab_b']):
+        features[:, FEATURE_LAYOUT[name]] = _segment_mean(segments, lab[:, column], count, sizes)
+
+    # Hue based red/green ratio over the saturated pixels only
+    hue, saturation = hsv[:, 0], hsv[:, 1]
+    saturated = saturation >= MIN_SATURATION
+    red = saturated & ((hue < RED_HUE_LOW) | (hue >= RED_HUE_HIGH))
+    green = saturated & (hue >= GREEN_HUE[0]) & (hue < GREEN_HUE[1])
+    red_count = np.bincount(segments, weights=red, minlength=count)
+    green_count = np.bincount(segments, weights=green, minlength=count)
+    features[:, FEATURE_LAYOUT['red_ratio']] = red_count / norm[:, 0]
+    features[:, FEATURE_LAYOUT['green_ratio']] = green_count / norm[:, 0]
+    features[:, FEATURE_LAYOUT['red_green_ratio']] = red_count / np.maximum(red_count + green_count, 1)
+
+    # Non black as in Examination.calculate_non_black_percentage: grayscale value above zero
+    non_black = np.bincount(segments, weights=gray > 0, minlength=count)
+    features[:, FEATURE_LAYOUT['pixel_count']] = sizes
+    features[:, FEATURE_LAYOUT['non_black_percentage']] = (non_black / np.maximum(frame_sizes, 1)) * 100
+
+    # Apparent area shrinks with the square of the distance; depth is in mm, size in pixel * m^2
+    depths = np.array([np.nan if depth is None else depth for depth in depths], dtype=np.float64)
+    features[:, FEATURE_LAYOUT['depth']] = depths
+    features[:, FEATURE_LAYOUT['size_normalized']] = sizes * (depths / 1000) ** 2
+
+    return features
+
+
+def extract_features(pixel_sets, depths=None, chunk_size=CHUNK_MASKS):
+    # pixel_sets: list of (pixels [N_i, 3] BGR uint8, frame_pixel_count) as returned by mask_pixels
+    count = len(pixel_sets)
+    if depths is None:
+        depths = [None] * count
+    chunks = [_extract_chunk(pixel_sets[start:start + chunk_size], depths[start:start + chunk_size])
+              for start in range(0, count, chunk_size)]
+    return np.concatenate(chunks) if chunks else np.zeros((0, FEATURE_SIZE), dtype=np.float64)
+
+
+def describe(feature_vector):
+    # Scalar features of a single detection as a JSON friendly dict (NaN -> None)
+    described = {}
+    for name in SCALAR_FEATURES:
+        value = float(feature_vector[FEATURE_LAYOUT[name]])
+        described[name] = None if np.isnan(value) else value
+    return described
+
+
+def arbitrary_score(features):
+    # Former Interpretation.calculate_arbitrary_value: sum of the non zero BGR means times the non black percentage
+    mean_sum = features[:, FEATURE_LAYOUT['mean_b']] + features[:, FEATURE_LAYOUT['mean_g']] + features[:, FEATURE_LAYOUT['mean_r']]
+    return mean_sum * features[:, FEATURE_LAYOUT['non_black_percentage']]
+
+
+def ripeness_score(features):
+    # 0 (all green) .. 100 (all red), blended with the Lab a* (green-red) axis
+    red_share = features[:, FEATURE_LAYOUT['red_green_ratio']]
+    a_star = np.clip((features[:, FEATURE_LAYOUT['mean_a']] - 128) / 64 + 0.5, 0, 1)
+    return 100 * (0.7 * red_share + 0.3 * a_star)
+
+
+SCORERS = {
+    'arbitrary': arbitrary_score,
+    'ripeness': ripeness_score,
+}
+
+
+def score_features(features, scorer='ripeness'):
+    if isinstance(scorer, str):
+        if scorer not in SCORERS:
+            raise ValueError(f"Unsupported scorer: {scorer}")
+        scorer = SCORERS[scorer]
+    return np.asarray(scorer(features), dtype=np.float64)
+
+
+def scorer_name(scorer):
+    return scorer if isinstance(scorer, str) else getattr(scorer, '__name__', 'custom')
+
+
+def save_features(results_path, keys, features, writer=None):
+    file_path = os.path.join(results_path, FEATURES_FILE)
+    if writer is not None:
+        writer.save_npz(file_path, keys=np.array(keys), features=features)
+    else:
+        Output.save_npz(file_path, keys=np.array(keys), features=features)
+
+
+def load_features(input_path):
+    with np.load(os.path.join(input_path, FEATURES_FILE)) as data:
+        return [str(key) for key in data['keys']], data['features']
+
+
+def load_depths(input_path, keys):
+    # Depth per detection from depths.json (written by Retreive_Depth), None where unknown
+    depths_json_path = os.path.join(input_path, 'depths.json')
+    if not os.path.exists(depths_json_path):
+        return [None] * len(keys)
+    with open(depths_json_path, 'r') as f:
+        depths_data = json.load(f)
+    return [depths_data[key]['depth'] if key in depths_data else None for key in keys]
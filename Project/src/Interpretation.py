@@ -4,16 +4,11 @@ import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 import json
-import shutil
+import Features
+import Manifest
+import Output
 
-def calculate_arbitrary_value(histogram, non_black_percentage):
-    # Extract values from the histogram dictionary and convert them to numeric types
-    histogram_values = [float(value) for value in histogram.values()]
-    # Example formula: sum of histogram values multiplied by non_black_percentage
-    result = sum(histogram_values) * non_black_percentage
-    return result
-
-def generate_dataset_from_json(input_path):
+def generate_dataset_from_json(input_path, scorer='ripeness'):
     print("\n")
     print("Genrating dataset from JSON files...")
     # Path to the JSON files
@@ -32,22 +27,29 @@ def generate_dataset_from_json(input_path):
     with open(depths_json_file_path, 'r') as f:
         depths_data = json.load(f)
 
+    # Score all detections in one call
+    feature_keys, features = Features.load_features(input_path)
+    scores = Features.score_features(features, scorer)
+    feature_rows = {key: row for row, key in enumerate(feature_keys)}
+
     # Find common keys
-    common_keys = set(centroids_data.keys()) & set(histograms_data.keys()) & set(non_black_percentage_data.keys()) & set(depths_data.keys())
+    common_keys = set(centroids_data.keys()) & set(histograms_data.keys()) & set(non_black_percentage_data.keys()) & set(depths_data.keys()) & set(feature_rows.keys())
 
     # Combine data
     combined_data = {}
     for key in common_keys:
         histogram = histograms_data[key]
         non_black_percentage = non_black_percentage_data[key]
-        arbitrary_value = calculate_arbitrary_value(histogram, non_black_percentage)
+        row = feature_rows[key]
         
         combined_data[key] = {
             'centroid': centroids_data[key],
             'histogram': histogram,
             'non_black_percentage': non_black_percentage,
             'depth': depths_data[key],
-            'arbitrary_value': arbitrary_value
+            'features': Features.describe(features[row]),
+            'score': float(scores[row]),
+            'scorer': Features.scorer_name(scorer)
         }
 
     # Sort the combined data
@@ -61,9 +63,10 @@ def generate_dataset_from_json(input_path):
     return sorted_combined_data
 
     
-def draw_arbitrary_value(combined_data, input_path, output_path):
+def draw_arbitrary_value(combined_data, input_path, output_path, writer=None):
     print("\n")
     print("Drawing arbitrary value on images...")
+    writer, own_writer = Output.open_writer(writer)
     # Group data by image number
     grouped_data = {}
     for key in combined_data:
@@ -86,7 +89,7 @@ def draw_arbitrary_value(combined_data, input_path, output_path):
         # Draw all data points on the image
         for data in data_list:
             centroid = data['centroid']
-            arbitrary_value = data['arbitrary_value']
+            score = data['score']
             depth = data['depth']
             
             # Draw the centroid
@@ -94,8 +97,8 @@ def draw_arbitrary_value(combined_data, input_path, output_path):
             centroid_y = int(centroid['centroid_y'])
             cv2.circle(image, (centroid_x, centroid_y), 5, (0, 255, 0), -1)
             
-            # Draw the arbitrary value
-            cv2.putText(image, f"Value: {arbitrary_value:.2f}", (centroid_x + 10, centroid_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+            # Draw the score, labelled with the scorer that produced it
+            cv2.putText(image, f"{data['scorer'].capitalize()}: {score:.2f}", (centroid_x + 10, centroid_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
             
             # Draw the depth value
             depth_value = depth['depth']
@@ -107,20 +110,29 @@ def draw_arbitrary_value(combined_data, input_path, output_path):
         # Save the modified image
         output_filename = f"Annotated_Combined_Masked_Pixels_{image_num}.jpg"
         output_image_path = os.path.join(output_path, output_filename)
-        cv2.imwrite(output_image_path, image)
+        writer.imwrite(output_image_path, image)
         print(f"Saved annotated image: {output_filename}")
+    Output.finish_writer(writer, own_writer)
     print("\n")
     print("Arbitrary calculation done.")
     print("\n")
     
-def generate_final_result(input_path, image_directory, combined_data):
+def generate_final_result(input_path, image_directory, combined_data, manifest=None, writer=None):
+    if manifest is None:
+        manifest = Manifest.build_manifest(image_directory=image_directory)
+    writer, own_writer = Output.open_writer(writer)
+
     # Create the "Final_Results" folder
     final_results_path = os.path.join(input_path, "Final_Results")
     os.makedirs(final_results_path, exist_ok=True)
 
-    # Find all Annotated_Combined_Masked_Pixels_[NUM] and Result_[NUM] images
+    # Find all Annotated_Combined_Masked_Pixels_[NUM] images
     annotated_images = [f for f in os.listdir(input_path) if f.startswith("Annotated_Combined_Masked_Pixels_")]
-    result_images = [f for f in os.listdir(input_path) if f.startswith("Result_")]
+
+    # Group data by image number once instead of filtering all of it per image
+    grouped_data = {}
+    for key, data in combined_data.items():
+        grouped_data.setdefault(int(re.search(r'Image_(\d+)_Mask', key).group(1)), {})[key] = data
 
     # Process each image group
     for annotated_image in annotated_images:
@@ -128,10 +140,14 @@ def generate_final_result(input_path, image_directory, combined_data):
         image_num = int(re.search(r'Annotated_Combined_Masked_Pixels_(\d+)', annotated_image).group(1))
         result_image = f"Result_{image_num}.jpg"
         combined_image = f"Combined_Masked_Pixels_{image_num}.jpg"
-        scene_image = f"scene_01_{image_num:04d}.png"
+        scene_image_path = Manifest.lookup(manifest, image_num)
+        if scene_image_path is None:
+            print(f"No scene image indexed for Image_{image_num}, skipping.")
+            continue
+        scene_image = os.path.basename(scene_image_path)
 
         # Create the "Image [NUM]" folder
-        image_folder = os.path.join(final_results_path, f"Scene_01_{image_num:04d}")
+        image_folder = os.path.join(final_results_path, Manifest.scene_label(manifest, image_num))
         os.makedirs(image_folder, exist_ok=True)
 
         # Create the "Raw" subfolder
@@ -140,23 +156,22 @@ def generate_final_result(input_path, image_directory, combined_data):
 
         # Copy the relevant images to the "Raw" subfolder
         for filename in [annotated_image, result_image, combined_image, scene_image]:
-            src_path = os.path.join(input_path, filename) if filename != scene_image else os.path.join(image_directory, filename)
+            src_path = os.path.join(input_path, filename) if filename != scene_image else scene_image_path
             if os.path.exists(src_path):
-                shutil.copy(src_path, raw_folder)
+                writer.copy(src_path, raw_folder)
             else:
                 print(f"File {filename} not found, skipping.")
 
         # Write the relevant data to a JSON file
-        relevant_data = {key: data for key, data in combined_data.items() if int(re.search(r'Image_(\d+)_Mask', key).group(1)) == image_num}
+        relevant_data = grouped_data.get(image_num, {})
         json_filename = f"Data_{image_num}.json"
         json_path = os.path.join(raw_folder, json_filename)
-        with open(json_path, 'w') as json_file:
-            json.dump(relevant_data, json_file, indent=4)
+        writer.write_json(json_path, relevant_data, indent=4)
         print(f"Saved JSON data: {json_filename}")
 
         # Load the images
         annotated_img = cv2.imread(os.path.join(input_path, annotated_image))
-        scene_img = cv2.imread(os.path.join(image_directory, scene_image))
+        scene_img = cv2.imread(scene_image_path)
 
         if annotated_img is None or scene_img is None:
             print(f"Error loading images for Image_{image_num}")
@@ -173,18 +188,20 @@ def generate_final_result(input_path, image_directory, combined_data):
 
         # Save the side-by-side comparison image
         comparison_image_path = os.path.join(image_folder, f"Comparison_{image_num}.png")
-        cv2.imwrite(comparison_image_path, comparison_img)
+        writer.imwrite(comparison_image_path, comparison_img)
         print(f"Saved comparison image: {comparison_image_path}")
 
-def main(input_path='Project/Results/Pipeline/RUN_4', results_path='Project/Results/Pipeline/RUN_4', image_directory='Project/Examples_ZED/RGB_left'):
+    Output.finish_writer(writer, own_writer)
+
+def main(input_path='Project/Results/Pipeline/RUN_4', results_path='Project/Results/Pipeline/RUN_4', image_directory='Project/Examples_ZED/RGB_left', scorer='ripeness', manifest=None, writer=None):
     print("\n") 
     print("=================================") 
     print("===== Interpretation Start ======")
     print("=================================") 
     
-    data = generate_dataset_from_json(input_path)
-    draw_arbitrary_value(data, input_path, results_path)
-    generate_final_result(input_path, image_directory, data)
+    data = generate_dataset_from_json(input_path, scorer=scorer)
+    draw_arbitrary_value(data, input_path, results_path, writer=writer)
+    generate_final_result(input_path, image_directory, data, manifest=manifest, writer=writer)
                 
     print("\n") 
     print("=================================") 
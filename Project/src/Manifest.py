@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import zlib
+import Output
+
+# Frames of scene_NN get the image id (NN - 1) * FRAMES_PER_SCENE + frame, so scene_01 ids equal the frame number
+FRAMES_PER_SCENE = 10000
+MAX_SCENES = 9999
+# Files without the scene naming are numbered from here on, above every scene id
+UNINDEXED_START = (MAX_SCENES + 1) * FRAMES_PER_SCENE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+MANIFEST_FILE = 'manifest.json'
+
+_scene_pattern = re.compile(r'^(scene_(\d+))_(\d+)$')
+
+
+def _checksum(file_path):
+    crc = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return f"{crc:08x}"
+
+
+def _scan(directory, extensions):
+    # Single pass over a directory: stem -> (filename, size)
+    files = {}
+    if directory is None or not os.path.isdir(directory):
+        return files
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() in extensions and entry.is_file():
+                files[stem] = (entry.name, entry.stat().st_size)
+    return files
+
+
+def build_manifest(image_directory=None, depth_directory=None, disparity_directory=None, checksums=False):
+    # Index a capture session once: image id -> scene, frame, RGB/depth/disparity files, sizes (and CRC32s)
+    directories = {'rgb': image_directory, 'depth': depth_directory, 'disparity': disparity_directory}
+    scans = {
+        'rgb': _scan(image_directory, IMAGE_EXTENSIONS),
+        'depth': _scan(depth_directory, ('.npy',)),
+        'disparity': _scan(disparity_directory, ('.npy',)),
+    }
+
+    stems = sorted(set().union(*(scan.keys() for scan in scans.values())))
+    frames = {}
+    unindexed = []
+
+    def add_frame(image_id, entry):
+        if image_id in frames:
+            raise ValueError(f"Image id {image_id} of {entry['stem']} collides with {frames[image_id]['stem']}")
+        frames[image_id] = entry
+
+    for stem in stems:
+        match = _scene_pattern.match(stem)
+        if not match:
+            unindexed.append(stem)
+            continue
+        scene, scene_number, frame = match.group(1), int(match.group(2)), int(match.group(3))
+        if not 1 <= scene_number <= MAX_SCENES:
+            raise ValueError(f"Scene number of {stem} must be between 1 and {MAX_SCENES}")
+        if frame >= FRAMES_PER_SCENE:
+            raise ValueError(f"Frame number of {stem} must be below {FRAMES_PER_SCENE}")
+        add_frame((scene_number - 1) * FRAMES_PER_SCENE + frame, {'scene': scene, 'frame': frame, 'stem': stem})
+
+    # Files without the scene_XX_NNNN pattern (e.g. Project/Examples) are numbered in sorted order in their own range
+    if unindexed:
+        print(f"{len(unindexed)} files do not follow the scene_XX_NNNN naming, numbering them from {UNINDEXED_START} in sorted order.")
+    for index, stem in enumerate(unindexed):
+        add_frame(UNINDEXED_START + index, {'scene': None, 'frame': index, 'stem': stem})
+
+    for entry in frames.values():
+        for kind, scan in scans.items():
+            filename, size = scan.get(entry['stem'], (None, None))
+            entry[kind] = filename
+            entry[f'{kind}_size'] = size
+            if checksums and filename is not None:
+                entry[f'{kind}_crc32'] = _checksum(os.path.join(directories[kind], filename))
+
+    return {'directories': directories, 'frames': dict(sorted(frames.items()))}
+
+
+def save_manifest(manifest, results_path, writer=None):
+    file_path = os.path.join(results_path, MANIFEST_FILE)
+    if writer is not None:
+        writer.write_json(file_path, manifest)
+    else:
+        Output.write_json(file_path, manifest)
+
+
+def load_manifest(input_path):
+    with open(os.path.join(input_path, MANIFEST_FILE), 'r') as f:
+        manifest = json.load(f)
+    manifest['frames'] = {int(image_id): entry for image_id, entry in manifest['frames'].items()}
+    return manifest
+
+
+def image_ids(manifest, kind='rgb'):
+    return [image_id for image_id, entry in manifest['frames'].items() if entry[kind] is not None]
+
+
+def lookup(manifest, image_id, kind='rgb'):
+    # Full path of the RGB/depth/disparity file of an image id, None if the session has none
+    entry = manifest['frames'].get(image_id)
+    if entry is None or entry[kind] is None:
+        return None
+    return os.path.join(manifest['directories'][kind], entry[kind])
+
+
+def scene_label(manifest, image_id):
+    # Folder name used for the final results, e.g. 'Scene_01_0001'
+    entry = manifest['frames'][image_id]
+    if entry['scene'] is None:
+        return entry['stem']
+    return f"{entry['scene'].capitalize()}_{entry['frame']:04d}"
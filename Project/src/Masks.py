@@ -0,0 +1,103 @@
+import os
+import math
+import json
+import cv2
+import numpy as np
+import Output
+
+
+def masks_filename(image_number):
+    return f'Masks_{image_number}.jsonl'
+
+
+def simplify_polygon(points, tolerance=1.0):
+    # Douglas-Peucker simplification; tolerance is the max deviation in pixels
+    points = np.int32(points).reshape(-1, 1, 2)
+    if tolerance > 0 and len(points) > 3:
+        points = cv2.approxPolyDP(points, tolerance, True)
+    return points.reshape(-1, 2)
+
+
+def encode_rle(binary_mask):
+    # Uncompressed COCO RLE: column-major run lengths, starting with a run of zeros
+    height, width = binary_mask.shape[:2]
+    pixels = binary_mask.ravel(order='F') > 0
+    if pixels.size == 0:
+        return {'size': [height, width], 'counts': []}
+    changes = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [pixels.size])))
+    if pixels[0]:
+        counts = np.concatenate(([0], counts))
+    return {'size': [height, width], 'counts': counts.tolist()}
+
+
+def decode_rle(rle):
+    height, width = rle['size']
+    counts = np.asarray(rle['counts'], dtype=np.int64)
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 255
+    return np.ascontiguousarray(np.repeat(values, counts).reshape(width, height).T)
+
+
+def mask_record(key, binary_mask, points, box, class_name, confidence, centroid, mask_format='polygon', tolerance=1.0):
+    height, width = binary_mask.shape[:2]
+    record = {
+        'key': key,
+        'class': class_name,
+        'confidence': round(float(confidence), 4),
+        'size': [height, width],
+        'bbox': [math.floor(box[0]), math.floor(box[1]), math.ceil(box[2]), math.ceil(box[3])],  # Covers every touched pixel
+        'centroid': [int(centroid[0]), int(centroid[1])],
+    }
+    if mask_format == 'polygon':
+        record['polygon'] = simplify_polygon(points, tolerance).ravel().tolist()
+    elif mask_format == 'rle':
+        record['rle'] = encode_rle(binary_mask)
+    else:
+        raise ValueError("Unsupported mask format")
+    return record
+
+
+def write_frame_masks(results_path, image_number, records, writer=None):
+    text = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    file_path = os.path.join(results_path, masks_filename(image_number))
+    if writer is not None:
+        writer.write_text(file_path, text)
+    else:
+        Output.write_text(file_path, text)
+
+
+def load_frame_masks(input_path, image_number):
+    file_path = os.path.join(input_path, masks_filename(image_number))
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def decode_mask(record, crop=False):
+    # Rebuild the 0/255 bitmap of a record, either full frame or cropped to its bounding box
+    height, width = record['size']
+    x0, y0, x1, y1 = record['bbox']
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, width), min(y1, height)
+    if 'rle' in record:
+        bitmap = decode_rle(record['rle'])
+        return bitmap[y0:y1, x0:x1].copy() if crop else bitmap
+
+    points = np.int32(record['polygon']).reshape(-1, 2)
+    if crop:
+        bitmap = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+        points = points - (x0, y0)
+    else:
+        bitmap = np.zeros((height, width), dtype=np.uint8)
+    cv2.fillPoly(bitmap, [points], 255)
+    return bitmap
+
+
+def masked_crop(frame, record):
+    # Pixels of the frame inside a record's mask, cropped to its bounding box and black elsewhere
+    bitmap = decode_mask(record, crop=True)
+    x0, y0 = max(record['bbox'][0], 0), max(record['bbox'][1], 0)
+    region = frame[y0:y0 + bitmap.shape[0], x0:x0 + bitmap.shape[1]]
+    return cv2.bitwise_and(region, region, mask=bitmap)
@@ -0,0 +1,187 @@
+import os
+import stat
+import json
+import tempfile
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import cv2
+import numpy as np
+
+
+def _default_mode():
+    # Mode a plain open() would create files with; mkstemp always uses 0600
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+DEFAULT_MODE = _default_mode()
+
+
+def publish(path, write, mode=DEFAULT_MODE):
+    # Stage into a hidden temp file next to the target, then rename it into place (atomic on one filesystem)
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())  # Data on disk before the rename, so a power loss cannot publish an empty file
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _write_image(path, image, params):
+    ok, buffer = cv2.imencode(os.path.splitext(path)[1], image, params or [])
+    if not ok:
+        raise IOError(f"Could not encode image {path}")
+    publish(path, lambda f: f.write(buffer.tobytes()))
+
+
+def write_json(path, data, indent=None):
+    separators = None if indent else (',', ':')
+    publish(path, lambda f: f.write(json.dumps(data, indent=indent, separators=separators).encode('utf-8')))
+
+
+def save_npz(path, **arrays):
+    publish(path, lambda f: np.savez_compressed(f, **arrays))
+
+
+def write_text(path, text):
+    publish(path, lambda f: f.write(text.encode('utf-8')))
+
+
+def copy(src_path, dst_directory):
+    # Like shutil.copy: keeps the permission bits of the source
+    def copy_into(f):
+        with open(src_path, 'rb') as src:
+            shutil.copyfileobj(src, f)
+    publish(os.path.join(dst_directory, os.path.basename(src_path)), copy_into, stat.S_IMODE(os.stat(src_path).st_mode))
+
+
+def _append_jsonl(path, records):
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_jsonl(path):
+    # Tolerates a torn last line left by a crash during an append
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+class ResultWriter:
+    # Background writer shared by the stages. Arrays handed to it must not be modified afterwards.
+    # At most max_pending writes are queued or running; submitting more blocks until one finishes,
+    # so a slow disk holds back the producer instead of buffering the whole session in memory.
+    def __init__(self, workers=4, max_pending=None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='result-writer')
+        self._append_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-appender')  # Keeps appends in order
+        self._slots = threading.BoundedSemaphore(max_pending or 4 * workers)
+        self._pending = {}  # owner -> futures not flushed yet
+        self._lock = threading.Lock()
+        self._owner = None
+
+    def for_owner(self, owner):
+        # View on the same pools and bound whose flush() waits only for, and raises only, the writes of this owner
+        view = ResultWriter.__new__(ResultWriter)
+        view.__dict__.update(self.__dict__)
+        view._owner = owner
+        return view
+
+    def _submit(self, pool, fn, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            pending = [pending for pending in self._pending.get(self._owner, []) if not pending.done() or pending.exception()]
+            pending.append(future)
+            self._pending[self._owner] = pending
+        return future
+
+    def imwrite(self, path, image, params=None):
+        return self._submit(self._pool, _write_image, path, image, params)
+
+    def write_json(self, path, data, indent=None):
+        return self._submit(self._pool, write_json, path, data, indent)
+
+    def save_npz(self, path, **arrays):
+        return self._submit(self._pool, save_npz, path, **arrays)
+
+    def write_text(self, path, text):
+        return self._submit(self._pool, write_text, path, text)
+
+    def copy(self, src_path, dst_directory):
+        return self._submit(self._pool, copy, src_path, dst_directory)
+
+    def append_jsonl(self, path, records):
+        return self._submit(self._append_pool, _append_jsonl, path, list(records))
+
+    @staticmethod
+    def _wait(pending):
+        wait(pending)
+        for future in pending:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def flush(self):
+        # Block until everything this owner submitted so far is on disk; re-raise its first failure
+        with self._lock:
+            pending = self._pending.pop(self._owner, [])
+        self._wait(pending)
+
+    def close(self):
+        if self._owner is not None:
+            # The pools belong to the writer the view was made from
+            self.flush()
+            return
+        try:
+            with self._lock:
+                pending = [future for futures in self._pending.values() for future in futures]
+                self._pending.clear()
+            self._wait(pending)
+        finally:
+            self._pool.shutdown()
+            self._append_pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_writer(writer=None):
+    # Stages use the writer they are given, or a private one when run on their own
+    if writer is not None:
+        return writer, False
+    return ResultWriter(), True
+
+
+def finish_writer(writer, owned):
+    # The next stage reads these files, so everything has to be on disk when a stage returns
+    if owned:
+        writer.close()
+    else:
+        writer.flush()
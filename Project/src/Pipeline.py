@@ -3,6 +3,9 @@ import Retreive_Depth
 import Examination
 import Interpretation
 import Cleanup
+import Manifest
+import Sweep
+import Output
 
 # Set the run number
 run = 1
@@ -13,6 +16,19 @@ full_cleanup = True
 # Visialization of intermediate results
 visualize = False
 
+# Mask geometry kept per frame ('polygon' simplified with mask_tolerance pixels, or 'rle')
+mask_format = 'polygon'
+mask_tolerance = 1.0
+
+# Threads writing result files in the background
+writer_workers = 4
+
+# Threshold sweep: set to a list of conf values to run inference once and evaluate all of them instead of the pipeline
+sweep_confs = None
+
+# Scoring function applied to the feature vectors ('ripeness' or 'arbitrary', see Features.SCORERS)
+scorer = 'ripeness'
+
 # Set the working directory
 specifier = 'Pipeline'
 working_directory = f'Project/Results/{specifier}/RUN_{run}'
@@ -20,19 +36,34 @@ working_directory = f'Project/Results/{specifier}/RUN_{run}'
 # Input directories
 image_directory = f'Project/Examples_ZED/RGB_left'
 depth_directory = f'Project/Examples_ZED/depth'
+disparity_directory = f'Project/Examples_ZED/disparity'
+
+# Store CRC32 checksums of every input file in the manifest (reads every file once)
+manifest_checksums = False
 
 def main():
-    # Ensure Segmentation runs first and completes
-    Segmentation.main(input_path=image_directory, results_path=working_directory, visualize=visualize)
-    
-    # Then run Retreive_Depth
-    Retreive_Depth.main(input_path=depth_directory, results_path=working_directory, coordinates_path=working_directory, visualize=visualize)
-    
-    # Then run Examination
-    Examination.main(input_path=working_directory, results_path=working_directory, visualize=visualize)
-    
-    # Then run Interpretation
-    Interpretation.main(input_path=working_directory, results_path=working_directory, image_directory=image_directory)
+    # One background writer pool shared by all stages
+    with Output.ResultWriter(workers=writer_workers) as writer:
+        # Index the session once; every stage looks its files up in the manifest
+        manifest = Manifest.build_manifest(image_directory, depth_directory, disparity_directory, checksums=manifest_checksums)
+        Manifest.save_manifest(manifest, working_directory, writer=writer)
+
+        if sweep_confs:
+            Sweep.main(confs=sweep_confs, input_path=image_directory, depth_path=depth_directory, results_path=working_directory, manifest=manifest, writer=writer)
+            return
+
+        # Ensure Segmentation runs first and completes
+        Segmentation.main(input_path=image_directory, results_path=working_directory, visualize=visualize, manifest=manifest,
+                          mask_format=mask_format, mask_tolerance=mask_tolerance, writer=writer)
+        
+        # Then run Retreive_Depth
+        Retreive_Depth.main(input_path=depth_directory, results_path=working_directory, coordinates_path=working_directory, visualize=visualize, manifest=manifest, writer=writer)
+        
+        # Then run Examination
+        Examination.main(input_path=working_directory, results_path=working_directory, visualize=visualize, manifest=manifest, writer=writer)
+        
+        # Then run Interpretation
+        Interpretation.main(input_path=working_directory, results_path=working_directory, image_directory=image_directory, scorer=scorer, manifest=manifest, writer=writer)
     
     # Finally run Cleanup
     Cleanup.main(input_path=working_directory, full_cleanup=full_cleanup)
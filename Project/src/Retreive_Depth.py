@@ -4,11 +4,12 @@ import matplotlib.pyplot as plt
 import json
 import os
 import re
+import Manifest
+import Output
 
-def load_depth_data(input_path, image_number):
-    input_path = os.path.normpath(input_path)
-    depth_file = os.path.join(input_path, f'scene_01_{image_number:04d}.npy')
-    if os.path.exists(depth_file):
+def load_depth_data(manifest, image_number):
+    depth_file = Manifest.lookup(manifest, image_number, 'depth')
+    if depth_file is not None and os.path.exists(depth_file):
         return depth_file
     else:
         raise FileNotFoundError(f"Depth file for image number {image_number} not found.")
@@ -44,21 +45,24 @@ def visualize_depth_data(depth_data, title):
     plt.ylabel('Y-axis')
     plt.show()
     
-def get_centroid_coordinates(image_number, input_path):
-    # Path to the JSON file
-    json_file_path = os.path.join(input_path, 'centroids.json')
-    
-    # Read the JSON file
-    with open(json_file_path, 'r') as f:
-        centroids = json.load(f)
-    
-    # Extract coordinates for the specified image number
-    coordinates = []
+def load_centroids(input_path):
+    # Detections from Segmentation's append-only log; complete frames survive a crash mid-run
+    log_path = os.path.join(input_path, 'centroids.jsonl')
+    if os.path.exists(log_path):
+        return {record['key']: {'centroid_x': record['centroid_x'], 'centroid_y': record['centroid_y']}
+                for record in Output.read_jsonl(log_path)}
+
+    # Older runs only have the JSON file
+    with open(os.path.join(input_path, 'centroids.json'), 'r') as f:
+        return json.load(f)
+
+def group_centroid_coordinates(centroids):
+    # Coordinates of all images at once: image number -> [(key, x, y), ...]
+    grouped = {}
     for key, value in centroids.items():
-        if key.startswith(f"Image_{image_number}_"):
-            coordinates.append((key, value['centroid_x'], value['centroid_y']))
-    
-    return coordinates
+        image_number = int(re.match(r'^Image_(\d+)_', key).group(1))
+        grouped.setdefault(image_number, []).append((key, value['centroid_x'], value['centroid_y']))
+    return grouped
 
 def retrieve_depth_info(depth_data, x, y):
     # Retrieve the depth value at a specific (x, y) coordinate
@@ -67,21 +71,22 @@ def retrieve_depth_info(depth_data, x, y):
     else:
         raise ValueError("Coordinates out of bounds")
 
-def main(input_path='Project/Examples_ZED/depth', results_path='Project/Results/Test', coordinates_path='Project/Results/Test', visualize=True):    
+def main(input_path='Project/Examples_ZED/depth', results_path='Project/Results/Test', coordinates_path='Project/Results/Test', visualize=True, manifest=None, writer=None):    
     print("\n") 
     print("=================================") 
     print("===== Depth Retrieval Start =====")
     print("=================================") 
     
-    # Extract image numbers from filenames in the directory
-    image_numbers = []
-    pattern = re.compile(r'^scene_\d+_(\d+)\.npy$')
+    # Look up the depth files through the session manifest
+    if manifest is None:
+        manifest = Manifest.build_manifest(depth_directory=input_path)
+    image_numbers = [(image_number, manifest['frames'][image_number]['depth']) for image_number in Manifest.image_ids(manifest, 'depth')]
     
-    for filename in os.listdir(input_path):
-        match = pattern.match(filename)
-        if match:
-            image_number = int(match.group(1))
-            image_numbers.append((image_number, filename))
+    # Read the detections once and republish them as centroids.json for the later stages
+    writer, own_writer = Output.open_writer(writer)
+    centroids = load_centroids(coordinates_path)
+    writer.write_json(os.path.join(results_path, 'centroids.json'), centroids)
+    coordinates_by_image = group_centroid_coordinates(centroids)
     
     # Initialize an empty dictionary to store depth information
     depth_info = {}
@@ -91,7 +96,7 @@ def main(input_path='Project/Examples_ZED/depth', results_path='Project/Results/
         print(f"Results for {filename}:\n")
         
         # Load the depth data file corresponding to the image number
-        depth_file = load_depth_data(input_path, image_number)
+        depth_file = load_depth_data(manifest, image_number)
         
         # Load the depth data
         depth_data = np.load(depth_file)
@@ -101,7 +106,7 @@ def main(input_path='Project/Examples_ZED/depth', results_path='Project/Results/
             visualize_depth_data(depth_data, title=depth_file)
         
         # Get centroid coordinates for the specified image number
-        coordinates = get_centroid_coordinates(image_number, coordinates_path)
+        coordinates = coordinates_by_image.get(image_number, [])
         
         print(f"Centroid coordinates for Image_{image_number}: {coordinates}")
         
@@ -131,8 +136,8 @@ def main(input_path='Project/Examples_ZED/depth', results_path='Project/Results/
         
     # Write the depth information to a new JSON file called depths.json
     depths_json_path = os.path.join(results_path, 'depths.json')
-    with open(depths_json_path, 'w') as f:
-        json.dump(depth_info, f, indent=4)
+    writer.write_json(depths_json_path, depth_info, indent=4)
+    Output.finish_writer(writer, own_writer)
 
     print("\n") 
     print("=================================") 
@@ -0,0 +1,222 @@
+import os
+import time
+import queue
+import threading
+import itertools
+import Segmentation
+import Retreive_Depth
+import Examination
+import Interpretation
+import Cleanup
+import Manifest
+import Output
+
+# Worker pools: I/O bound (indexing, drawing, writing), model inference, light statistics
+DEFAULT_POOL_SIZES = {'io': 4, 'inference': 1, 'stats': max(1, (os.cpu_count() or 2) - 1)}
+
+# Per session DAG: stage -> (pool, dependencies)
+STAGES = {
+    'manifest': ('io', []),
+    'segmentation': ('inference', ['manifest']),
+    'depth': ('stats', ['segmentation']),
+    'examination': ('stats', ['depth']),
+    'interpretation': ('io', ['examination']),
+    'cleanup': ('io', ['interpretation']),
+}
+
+
+def make_session(name, capture_directory, results_path, priority=0, full_cleanup=True, scorer='ripeness'):
+    # A capture branch as written by DAQ.py, e.g. 'data/240718_test/ZED'
+    return {
+        'name': name,
+        'image_directory': os.path.join(capture_directory, 'RGB_left'),
+        'depth_directory': os.path.join(capture_directory, 'depth'),
+        'disparity_directory': os.path.join(capture_directory, 'disparity'),
+        'working_directory': results_path,
+        'priority': priority,
+        'full_cleanup': full_cleanup,
+        'scorer': scorer,
+    }
+
+
+def discover_sessions(capture_roots, results_root, branches=('ZED', 'ZED_default'), priority=0):
+    # Every camera branch with images in each capture root becomes its own session.
+    # DAQ.py creates all branch folders but only fills 'ZED', so empty branches are skipped.
+    sessions = []
+    for capture_root in capture_roots:
+        for branch in branches:
+            session = make_session('', os.path.join(capture_root, branch), '', priority)
+            manifest = Manifest.build_manifest(session['image_directory'], session['depth_directory'], session['disparity_directory'])
+            if not Manifest.image_ids(manifest):
+                continue
+            session['name'] = f"{os.path.basename(os.path.normpath(capture_root))}_{branch}"
+            session['working_directory'] = os.path.join(results_root, session['name'])
+            session['manifest'] = manifest  # Reused by the manifest stage instead of scanning again
+            sessions.append(session)
+    return sessions
+
+
+def run_stage(stage, session, state):
+    working_directory = session['working_directory']
+    if stage == 'manifest':
+        state['manifest'] = session.get('manifest') or Manifest.build_manifest(session['image_directory'], session['depth_directory'], session['disparity_directory'])
+        Manifest.save_manifest(state['manifest'], working_directory, writer=state['writer'])
+    elif stage == 'segmentation':
+        Segmentation.main(input_path=session['image_directory'], results_path=working_directory, visualize=False,
+                          manifest=state['manifest'], writer=state['writer'])
+    elif stage == 'depth':
+        Retreive_Depth.main(input_path=session['depth_directory'], results_path=working_directory, coordinates_path=working_directory,
+                            visualize=False, manifest=state['manifest'], writer=state['writer'])
+    elif stage == 'examination':
+        Examination.main(input_path=working_directory, results_path=working_directory, visualize=False,
+                         manifest=state['manifest'], writer=state['writer'])
+    elif stage == 'interpretation':
+        Interpretation.main(input_path=working_directory, results_path=working_directory, image_directory=session['image_directory'],
+                            scorer=session['scorer'], manifest=state['manifest'], writer=state['writer'])
+    elif stage == 'cleanup':
+        state['writer'].flush()
+        Cleanup.main(input_path=working_directory, full_cleanup=session['full_cleanup'])
+    else:
+        raise ValueError(f"Unsupported stage: {stage}")
+
+
+def print_progress(progress):
+    print(f"[{progress['session']}] {progress['stage']} {progress['status']} "
+          f"({progress['done']}/{progress['total']} stages, {progress['elapsed']:.1f}s)")
+
+
+class Scheduler:
+    def __init__(self, pool_sizes=None, report=print_progress, stages=STAGES, stage_runner=run_stage):
+        self.pool_sizes = dict(DEFAULT_POOL_SIZES, **(pool_sizes or {}))
+        self.report = report
+        self.stages = stages
+        self.stage_runner = stage_runner
+        self.queues = {pool: queue.PriorityQueue() for pool in self.pool_sizes}
+        self.sessions = {}
+        self._order = itertools.count()  # FIFO among equal priorities
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._remaining = 0
+        # One result writer for all sessions, sized like the io pool, so 'io' bounds the write concurrency;
+        # each session gets its own view of it, so a stage only waits for and fails on its own session's writes
+        self.writer = Output.ResultWriter(workers=self.pool_sizes['io'])
+
+    def add_session(self, session):
+        if session['name'] in self.sessions:
+            raise ValueError(f"Duplicate session name: {session['name']}")
+        self.sessions[session['name']] = {
+            'session': session,
+            'state': {'writer': self.writer.for_owner(session['name'])},
+            'done': set(),
+            'status': {stage: 'pending' for stage in self.stages},
+            'start': None,
+            'timings': {},
+        }
+
+    def _enqueue_ready(self, name):
+        # Called with the lock held: queue every pending stage whose dependencies are done
+        entry = self.sessions[name]
+        for stage, (pool, dependencies) in self.stages.items():
+            if entry['status'][stage] == 'pending' and all(dependency in entry['done'] for dependency in dependencies):
+                entry['status'][stage] = 'queued'
+                self.queues[pool].put((-entry['session']['priority'], next(self._order), name, stage))
+
+    def _skip_dependents(self, name, failed_stage):
+        entry = self.sessions[name]
+        skipped = {failed_stage}
+        for stage, (_, dependencies) in self.stages.items():
+            if entry['status'][stage] == 'pending' and skipped.intersection(dependencies):
+                entry['status'][stage] = 'skipped'
+                skipped.add(stage)
+                self._remaining -= 1
+
+    def _worker(self, pool):
+        while True:
+            _, _, name, stage = self.queues[pool].get()
+            if name is None:
+                return
+            entry = self.sessions[name]
+            with self._lock:
+                entry['status'][stage] = 'running'
+                if entry['start'] is None:
+                    entry['start'] = time.perf_counter()
+            start = time.perf_counter()
+            try:
+                self.stage_runner(stage, entry['session'], entry['state'])
+                status = 'done'
+            except (Exception, SystemExit) as e:
+                print(f"[{name}] {stage} failed: {e!r}")
+                status = 'failed'
+            with self._lock:
+                entry['timings'][stage] = time.perf_counter() - start
+                entry['status'][stage] = status
+                self._remaining -= 1
+                if status == 'done':
+                    entry['done'].add(stage)
+                    self._enqueue_ready(name)
+                else:
+                    self._skip_dependents(name, stage)
+                progress = {'session': name, 'stage': stage, 'status': status, 'done': len(entry['done']),
+                            'total': len(self.stages), 'elapsed': time.perf_counter() - entry['start']}
+                if self._remaining == 0:
+                    self._finished.set()
+            if self.report:
+                self.report(progress)
+
+    def _close_writer(self):
+        try:
+            self.writer.close()
+        except Exception as e:
+            print(f"Result writer failed: {e!r}")
+
+    def run(self):
+        # Process all sessions; returns per session stage status and timings
+        if not self.sessions:
+            self._close_writer()
+            return {}
+        with self._lock:
+            self._remaining = len(self.sessions) * len(self.stages)
+            for name in self.sessions:
+                self._enqueue_ready(name)
+
+        threads = []
+        for pool, size in self.pool_sizes.items():
+            for _ in range(size):
+                thread = threading.Thread(target=self._worker, args=(pool,), daemon=True)
+                thread.start()
+                threads.append((pool, thread))
+        self._finished.wait()
+        for pool, _ in threads:
+            self.queues[pool].put((float('inf'), next(self._order), None, None))
+        for _, thread in threads:
+            thread.join()
+        self._close_writer()
+
+        return {name: {'status': dict(entry['status']), 'timings': dict(entry['timings'])}
+                for name, entry in self.sessions.items()}
+
+
+def main(capture_roots=('data/240718_test',), results_root='Project/Results/Scheduler', pool_sizes=None):
+    print("\n")
+    print("=================================")
+    print("======= Scheduler Start =========")
+    print("=================================")
+
+    scheduler = Scheduler(pool_sizes)
+    for session in discover_sessions(capture_roots, results_root):
+        scheduler.add_session(session)
+    results = scheduler.run()
+
+    for name, result in results.items():
+        print(f"{name}: {result['status']}")
+
+    print("\n")
+    print("=================================")
+    print("======== Scheduler End ==========")
+    print("=================================")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
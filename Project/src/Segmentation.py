@@ -1,5 +1,4 @@
 import os
-import glob
 import requests
 from PIL import Image, ImageDraw
 from io import BytesIO
@@ -7,8 +6,9 @@ import matplotlib.pyplot as plt
 from ultralytics import YOLO
 import cv2
 import numpy as np
-import json
-import re
+import Manifest
+import Masks
+import Output
 
 
 def display_image(img):
@@ -17,14 +17,6 @@ def display_image(img):
     plt.show()
     
 
-def load_local_images(path):
-    path = os.path.normpath(path)
-    images = glob.glob(os.path.join(path, '*.jpeg'))
-    images.extend(glob.glob(os.path.join(path, '*.jpg')))
-    images.extend(glob.glob(os.path.join(path, '*.png')))
-    return images
-
-
 def load_remote_image(url):
     response = requests.get(url)
     img = Image.open(BytesIO(response.content))
@@ -38,14 +30,16 @@ def load_model(model_used):
         raise ValueError("Unsupported model type")
 
 
-def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_path='Project/Results/Test', visualize=True):
+def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_path='Project/Results/Test', visualize=True, manifest=None, mask_format='polygon', mask_tolerance=1.0, writer=None):
     print("\n") 
     print("=================================") 
     print("==== Mask Segmentation Start ====")
     print("=================================") 
     
-    # Load images
-    images = load_local_images(input_path)
+    # Look up images through the session manifest
+    if manifest is None:
+        manifest = Manifest.build_manifest(image_directory=input_path)
+    images = [(image_id, Manifest.lookup(manifest, image_id)) for image_id in Manifest.image_ids(manifest)]
     
     # Pre check images
     if not images:
@@ -59,27 +53,22 @@ def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_p
     if not os.path.exists(results_path):
         os.makedirs(results_path)
 
+    # Files are written in the background; detections are appended to an append-only log per frame,
+    # Retreive_Depth reads it and publishes centroids.json
+    writer, own_writer = Output.open_writer(writer)
+    centroids_log_path = os.path.join(results_path, 'centroids.jsonl')
+    open(centroids_log_path, 'w').close()
+    if os.path.exists(os.path.join(results_path, 'centroids.json')):
+        os.remove(os.path.join(results_path, 'centroids.json'))
+
     yolo_classes = list(model.names.values())
     classes_ids = [yolo_classes.index(clas) for clas in yolo_classes]
 
-    # Dictionary to store centroid coordinates
-    centroids = {}
-
     # Define colors
     dark_blue = (139, 0, 0)  # Dark blue in BGR format
     orange = (0, 165, 255)   # Orange in BGR format
 
-    for i, image_path in enumerate(images):
-        # Extract the image number if the naming follows the pattern 'scene_XX_0001.png'
-        image_name = os.path.basename(image_path)
-        match = re.match(r'^scene_\d+_(\d+)\.png$', image_name)
-        if match:
-            try:
-                image_number = int(match.group(1))
-                i = image_number
-            except ValueError:
-                pass  # If conversion fails, keep the original index
-        
+    for i, image_path in images:
         print("\n")    
         print(f"Operating on {image_path}...\n")
             
@@ -87,6 +76,8 @@ def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_p
         img_copy = img.copy()   
         img_mask = img.copy() # Visualize all masks on the original image
         combined_masked_pixels = np.zeros_like(img)
+        mask_records = []
+        frame_centroids = []
         results = model.predict(img, conf=conf)
         
         interest_flag = False
@@ -132,7 +123,11 @@ def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_p
                         cX, cY = 0, 0
 
                     # Store the coordinates in the dictionary
-                    centroids[f"Image_{i}_Mask_{mask_index}"] = {"centroid_x": cX, "centroid_y": cY}
+                    frame_centroids.append({"key": f"Image_{i}_Mask_{mask_index}", "centroid_x": cX, "centroid_y": cY})
+
+                    # Keep the mask geometry (simplified polygon or RLE); Examination cuts the mask pixels out of the frame with it
+                    mask_records.append(Masks.mask_record(f"Image_{i}_Mask_{mask_index}", binary_mask, points, box.xyxy[0].tolist(),
+                                                          class_name, box.conf[0], (cX, cY), mask_format, mask_tolerance))
 
                     # Fill the mask with dark blue color                 
                     cv2.fillPoly(img_mask, points, dark_blue)
@@ -149,17 +144,16 @@ def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_p
                     # Draw the centroid on the image
                     cv2.circle(img_mask, (cX, cY), 5, orange, -1)         
                     cv2.putText(img_mask, label, (start_point[0], start_point[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, dark_blue, 2)  
-                    
-                    # Save the masked pixels image                  
-                    cv2.imwrite(os.path.join(results_path, f'Image_{i}_Mask_{mask_index}.jpg'), masked_pixels)
                 
             else:
                 print("No masks found for this result.")
         
         # Only save the resulting images if at least one mask was found
         if interest_flag:        
-            cv2.imwrite(os.path.join(results_path, f'Result_{i}.jpg'), img_mask)
-            cv2.imwrite(os.path.join(results_path, f'Combined_Masked_Pixels_{i}.jpg'), combined_masked_pixels)
+            writer.imwrite(os.path.join(results_path, f'Result_{i}.jpg'), img_mask)
+            writer.imwrite(os.path.join(results_path, f'Combined_Masked_Pixels_{i}.jpg'), combined_masked_pixels)
+            Masks.write_frame_masks(results_path, i, mask_records, writer=writer)
+            writer.append_jsonl(centroids_log_path, frame_centroids)
 
             # Visualize the results 
             if visualize:        
@@ -167,10 +161,7 @@ def main(model_used="yolov8", conf=0.5, input_path='Project/Examples', results_p
                 cv2.imshow(f"Combined Masked Pixels {i}", combined_masked_pixels)
                 cv2.waitKey(0)        
 
-            # Write the centroids dictionary to a JSON file
-            if centroids:
-                with open(os.path.join(results_path, 'centroids.json'), 'w') as f:
-                    json.dump(centroids, f, indent=4)
+    Output.finish_writer(writer, own_writer)
         
     print("\n") 
     print("=================================") 
@@ -0,0 +1,183 @@
+import os
+import time
+import cv2
+import numpy as np
+import Manifest
+import Segmentation
+import Output
+
+CACHE_FILE = 'inference_cache.npz'
+
+
+def cache_inference(model, manifest, base_conf=0.05, model_used='yolov8'):
+    # Run the model once per frame at a low threshold and keep the raw detections of the whole session.
+    # NMS does not depend on conf, so filtering these arrays later matches predicting at a higher conf.
+    frame_ids, inference_times = [], []
+    det_frame, boxes, scores, classes, centroids, depths = [], [], [], [], [], []
+    polygon_points, polygon_lengths = [], []
+
+    for image_id in Manifest.image_ids(manifest):
+        image_path = Manifest.lookup(manifest, image_id)
+        print(f"Caching detections for {image_path}...")
+        img = cv2.imread(image_path)
+        start = time.perf_counter()
+        results = model.predict(img, conf=base_conf, verbose=False)
+        inference_times.append(time.perf_counter() - start)
+        frame_ids.append(image_id)
+
+        depth_file = Manifest.lookup(manifest, image_id, 'depth')
+        depth_data = np.load(depth_file) if depth_file is not None else None
+
+        for result in results:
+            if not result.masks:
+                continue
+            for mask, box in zip(result.masks.xy, result.boxes):
+                points = np.int32([mask])
+                binary_mask = np.zeros(img.shape[:2], dtype=np.uint8)
+                cv2.fillPoly(binary_mask, points, 255)
+                moments = cv2.moments(binary_mask)
+                if moments["m00"] != 0:
+                    cX, cY = int(moments["m10"] / moments["m00"]), int(moments["m01"] / moments["m00"])
+                else:
+                    cX, cY = 0, 0
+
+                depth = np.nan
+                if depth_data is not None and 0 <= cX < depth_data.shape[1] and 0 <= cY < depth_data.shape[0]:
+                    depth = float(depth_data[cY, cX])
+
+                det_frame.append(image_id)
+                boxes.append(box.xyxy[0].tolist())
+                scores.append(float(box.conf[0]))
+                classes.append(int(box.cls[0]))
+                centroids.append((cX, cY))
+                depths.append(depth)
+                polygon_points.append(points.reshape(-1, 2))
+                polygon_lengths.append(len(polygon_points[-1]))
+
+    return {
+        'model_used': np.array(model_used),
+        'image_directory': np.array(_image_directory(manifest)),
+        'base_conf': np.float32(base_conf),
+        'class_names': np.array([model.names[i] for i in sorted(model.names)]),
+        'frame_ids': np.array(frame_ids, dtype=np.int64),
+        'inference_times': np.array(inference_times, dtype=np.float64),
+        'det_frame': np.array(det_frame, dtype=np.int64),
+        'boxes': np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        'scores': np.array(scores, dtype=np.float32),
+        'classes': np.array(classes, dtype=np.int64),
+        'centroids': np.array(centroids, dtype=np.int32).reshape(-1, 2),
+        'depths': np.array(depths, dtype=np.float32),
+        'polygon_points': np.concatenate(polygon_points).astype(np.int32) if polygon_points else np.zeros((0, 2), dtype=np.int32),
+        'polygon_offsets': np.concatenate(([0], np.cumsum(polygon_lengths))).astype(np.int64),
+    }
+
+
+def save_cache(cache, results_path, writer=None):
+    file_path = os.path.join(results_path, CACHE_FILE)
+    if writer is not None:
+        writer.save_npz(file_path, **cache)
+    else:
+        Output.save_npz(file_path, **cache)
+
+
+def load_cache(input_path):
+    with np.load(os.path.join(input_path, CACHE_FILE)) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _image_directory(manifest):
+    return os.path.abspath(manifest['directories']['rgb'] or '')
+
+
+def cache_matches(cache, manifest, model_used, base_conf):
+    # A cache is only valid for the same image set, model and base threshold
+    frame_ids = Manifest.image_ids(manifest)
+    return ('model_used' in cache and 'image_directory' in cache
+            and str(cache['model_used']) == model_used
+            and str(cache['image_directory']) == _image_directory(manifest)
+            and np.isclose(float(cache['base_conf']), np.float32(base_conf))
+            and np.array_equal(cache['frame_ids'], np.array(frame_ids, dtype=np.int64)))
+
+
+def sweep(cache, confs, class_filter=('apple',)):
+    # Evaluate every threshold on the cached arrays: one boolean matrix [threshold, detection]
+    confs = np.sort(np.asarray(confs, dtype=np.float32))
+    if np.any(confs < cache['base_conf']):
+        raise ValueError(f"Thresholds below the cached base_conf {float(cache['base_conf'])} cannot be evaluated")
+
+    start = time.perf_counter()
+    if class_filter:
+        wanted = np.flatnonzero(np.isin(cache['class_names'], list(class_filter)))
+        class_mask = np.isin(cache['classes'], wanted)
+    else:
+        class_mask = np.ones(len(cache['classes']), dtype=bool)
+    kept = (cache['scores'][None, :] >= confs[:, None]) & class_mask[None, :]
+
+    frame_index = np.searchsorted(cache['frame_ids'], cache['det_frame'])
+    frames_hit = np.zeros((len(confs), len(cache['frame_ids'])), dtype=bool)
+    rows, columns = np.nonzero(kept)
+    frames_hit[rows, frame_index[columns]] = True
+
+    detections = kept.sum(axis=1)
+    with_depth = (kept & np.isfinite(cache['depths'])[None, :]).sum(axis=1)
+    filter_time = (time.perf_counter() - start) / max(len(confs), 1)
+
+    results = {}
+    for row, conf in enumerate(confs):
+        results[f"{conf:.2f}"] = {
+            'detections': int(detections[row]),
+            'frames_with_detections': int(frames_hit[row].sum()),
+            'depth_coverage': float(with_depth[row] / detections[row]) if detections[row] else None,
+            'filter_time_s': filter_time,
+        }
+    return results
+
+
+def main(model_used="yolov8", base_conf=0.05, confs=(0.25, 0.3, 0.4, 0.5, 0.6, 0.7), input_path='Project/Examples_ZED/RGB_left',
+         depth_path='Project/Examples_ZED/depth', results_path='Project/Results/Sweep', class_filter=('apple',), manifest=None, reuse_cache=True, writer=None):
+    print("\n")
+    print("=================================")
+    print("===== Threshold Sweep Start =====")
+    print("=================================")
+
+    os.makedirs(results_path, exist_ok=True)
+    writer, own_writer = Output.open_writer(writer)
+
+    if manifest is None:
+        manifest = Manifest.build_manifest(image_directory=input_path, depth_directory=depth_path)
+
+    cache = None
+    if reuse_cache and os.path.exists(os.path.join(results_path, CACHE_FILE)):
+        cache = load_cache(results_path)
+        if cache_matches(cache, manifest, model_used, base_conf):
+            print(f"Reusing cached detections from {results_path}")
+        else:
+            print(f"Cached detections in {results_path} are for other images, model or base_conf, running inference again")
+            cache = None
+    if cache is None:
+        model = Segmentation.load_model(model_used)
+        cache = cache_inference(model, manifest, base_conf, model_used)
+        save_cache(cache, results_path, writer=writer)
+
+    results = {
+        'base_conf': float(cache['base_conf']),
+        'frames': int(len(cache['frame_ids'])),
+        'inference_time_s': float(cache['inference_times'].sum()),
+        'thresholds': sweep(cache, confs, class_filter),
+    }
+    writer.write_json(os.path.join(results_path, 'sweep.json'), results, indent=4)
+    Output.finish_writer(writer, own_writer)
+
+    for conf, values in results['thresholds'].items():
+        print(f"conf {conf}: {values['detections']} detections in {values['frames_with_detections']} frames, depth coverage {values['depth_coverage']}")
+
+    print("\n")
+    print("=================================")
+    print("====== Threshold Sweep End ======")
+    print("=================================")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()